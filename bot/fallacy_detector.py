@@ -1,14 +1,91 @@
 from openai import OpenAI
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, TypedDict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
 import logging
+import re
+import threading
+import msgspec
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of fallacy analyses kept in the in-memory LRU cache
+FALLACY_CACHE_SIZE = 4096
+
+# Maximum number of texts analyzed in a single OpenAI request
+DETECTION_BATCH_SIZE = 10
+
+class Fallacy(TypedDict):
+    """A single fallacy as returned by the model."""
+    type: str
+    explanation: str
+    confidence: float
+
+# Decoders for the model's JSON output, validating the expected shape while parsing
+_FALLACIES_DECODER = msgspec.json.Decoder(List[Fallacy])
+_FALLACIES_BATCH_DECODER = msgspec.json.Decoder(List[List[Fallacy]])
+
+# Cheap first-stage filter: phrases that commonly signal a fallacy. Tweets without
+# any of them are skipped by the webhook before paying for an OpenAI call.
+FALLACY_INDICATORS = (
+    # ad hominem
+    "idiot", "stupid", "moron", "liar", "clown", "hypocrite", "you people", "so-called",
+    "socialist", "communist", "fascist", "snowflake",
+    # false dichotomy
+    "either", "or else", "only two", "only option", "with us or",
+    # appeal to authority
+    "experts say", "scientists say", "doctors say", "studies show", "according to",
+    # strawman
+    "so you're saying", "so you think", "you want to", "they want to",
+    # slippery slope
+    "next thing", "will lead to", "leads to", "before you know it", "end of",
+    # appeal to emotion
+    "think of the children", "disgusting", "outrageous", "shameful", "terrifying",
+    # hasty generalization
+    "always", "never", "all of them", "every single", "nobody", "no one",
+    # circular reasoning
+    "because it is", "because it's true", "by definition",
+    # bandwagon
+    "everyone knows", "everybody knows", "everyone agrees", "most people", "millions of",
+    "real americans",
+    # anecdotal
+    "my friend", "my neighbor", "i know someone", "happened to me", "proves",
+)
+_INDICATOR_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(phrase) for phrase in FALLACY_INDICATORS) + r")\b",
+    re.IGNORECASE,
+)
+_APOSTROPHES = str.maketrans({"\u2018": "'", "\u2019": "'"})
+
+# Detection may run in worker threads (see webhook_handler), so guard the cache
+_cache_lock = threading.Lock()
+
+# Fallacy analyses keyed by tweet hash so repeated tweets skip the OpenAI call. Kept at
+# module level so it outlives detector instances, e.g. across Streamlit dashboard reruns
+_fallacy_cache = OrderedDict()
+
+def _cache_get(cache: OrderedDict, key):
+    """Return the cached value for key, marking it most recently used."""
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def _cache_put(cache: OrderedDict, key, value, max_size: int) -> None:
+    """Store value under key, evicting the least recently used entry when full."""
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+
 class FallacyDetector:
     def __init__(self):
         api_key = os.getenv("OPENAI_API_KEY")
@@ -34,10 +111,27 @@ class FallacyDetector:
         
         logger.info("FallacyDetector initialized successfully")
     
+    @staticmethod
+    def _text_hash(text: str) -> bytes:
+        """Hash the text with runs of whitespace collapsed."""
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+    
+    def has_fallacy_indicators(self, text: str) -> bool:
+        """Cheaply check whether the text contains any common fallacy indicator phrase."""
+        # Mobile clients send curly apostrophes; the indicator phrases use ASCII ones
+        return _INDICATOR_PATTERN.search(text.translate(_APOSTROPHES)) is not None
+    
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def detect_fallacies(self, text: str) -> List[Dict[str, Any]]:
         """Detect logical fallacies in the given text."""
-        logger.info(f"Analyzing text for fallacies: {text}")
+        logger.debug("Analyzing text for fallacies: %s", text)
+        
+        cache_key = self._text_hash(text)
+        cached = _cache_get(_fallacy_cache, cache_key)
+        if cached is not None:
+            logger.debug("Using cached fallacy analysis")
+            return cached
         
         prompt = f"""You are an expert at detecting logical fallacies. Analyze this text for logical fallacies:
 
@@ -80,29 +174,140 @@ Your analysis in JSON format:"""
                 temperature=0.3,
                 max_tokens=1000
             )
-            logger.info(f"Chat API Response received")
+            logger.info("Chat API Response received")
             result = response.choices[0].message.content.strip()
             
-            logger.info(f"Raw response content: {result}")
+            logger.debug("Raw response content: %s", result)
             
             try:
-                fallacies = json.loads(result)
-                if not isinstance(fallacies, list):
-                    logger.error(f"Error: Response is not a list: {result}")
-                    return []
+                fallacies = _FALLACIES_DECODER.decode(result)
                     
-                logger.info(f"Detected fallacies: {json.dumps(fallacies, indent=2)}")
+                # Pretty-printing the result is only worth it when the message is emitted
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Detected fallacies: %s", json.dumps(fallacies, indent=2))
+                _cache_put(_fallacy_cache, cache_key, fallacies, FALLACY_CACHE_SIZE)
                 return fallacies
                 
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON: {e}")
-                logger.error(f"Raw response: {result}")
+            except msgspec.DecodeError as e:
+                logger.error("Error parsing JSON: %s", e)
+                logger.error("Raw response: %s", result)
                 return []
                 
         except Exception as e:
-            logger.error(f"Error in OpenAI request: {str(e)}")
+            logger.error("Error in OpenAI request: %s", e)
             return []
     
+    def detect_fallacies_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Detect logical fallacies in several texts, sharing one OpenAI request per batch."""
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(texts)
+        
+        # Serve cached texts directly and analyze each distinct uncached text only once
+        pending: Dict[bytes, List[int]] = {}
+        for i, text in enumerate(texts):
+            cache_key = self._text_hash(text)
+            cached = _cache_get(_fallacy_cache, cache_key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        pending_keys = list(pending)
+        batches = [
+            pending_keys[start:start + DETECTION_BATCH_SIZE]
+            for start in range(0, len(pending_keys), DETECTION_BATCH_SIZE)
+        ]
+        if batches:
+            # Each batch is an independent OpenAI round-trip, so send them concurrently
+            with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+                batch_results = executor.map(
+                    lambda batch_keys: self._detect_batch(batch_keys, [texts[pending[key][0]] for key in batch_keys]),
+                    batches,
+                )
+                for batch_keys, fallacies_per_text in zip(batches, batch_results):
+                    for key, fallacies in zip(batch_keys, fallacies_per_text):
+                        for i in pending[key]:
+                            results[i] = fallacies
+        
+        return results
+    
+    def _detect_batch(self, cache_keys: List[bytes], texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Analyze one batch of uncached texts, caching the results."""
+        if len(texts) == 1:
+            return [self.detect_fallacies(texts[0])]
+        
+        batch_results = self._request_fallacies_batch(texts)
+        if batch_results is None:
+            # Fall back to one request per text, sent concurrently, rather than dropping the batch
+            with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+                return list(executor.map(self.detect_fallacies, texts))
+        
+        for key, fallacies in zip(cache_keys, batch_results):
+            _cache_put(_fallacy_cache, key, fallacies, FALLACY_CACHE_SIZE)
+        return batch_results
+    
+    def _request_fallacies_batch(self, texts: List[str]) -> Optional[List[List[Dict[str, Any]]]]:
+        """Analyze several texts in one OpenAI request. Returns None if the response is unusable."""
+        numbered_texts = "\n".join(f'{i}. "{text}"' for i, text in enumerate(texts, 1))
+        
+        prompt = f"""You are an expert at detecting logical fallacies. Analyze each of these {len(texts)} texts for logical fallacies:
+
+{numbered_texts}
+
+Example analysis:
+1. "Everyone knows that video games cause violence. My neighbor's kid played violent games and got into a fight at school, so that proves it!"
+2. "The city council meets on Tuesday to vote on the new budget."
+[
+    [
+        {{
+            "type": "bandwagon",
+            "explanation": "Uses 'Everyone knows' to appeal to popular belief rather than evidence",
+            "confidence": 0.95
+        }},
+        {{
+            "type": "anecdotal",
+            "explanation": "Uses a single case of one child to draw a general conclusion about video games and violence",
+            "confidence": 0.9
+        }},
+        {{
+            "type": "hasty_generalization",
+            "explanation": "Concludes that video games cause violence based on a single incident",
+            "confidence": 0.85
+        }}
+    ],
+    []
+]
+
+Analyze the texts above. For each text, list ALL logical fallacies you find. Use these types: {', '.join(self.fallacies.keys())}
+Describe each fallacy as a JSON object with "type", "explanation", and "confidence".
+Format your response as a JSON array containing exactly {len(texts)} arrays, one per text in the order given.
+Use [] for a text ONLY if you are absolutely certain it has no fallacies.
+
+Your analysis in JSON format:"""
+
+        logger.info("Sending batch of %d texts to OpenAI...", len(texts))
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are an expert at detecting logical fallacies."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=min(4000, 500 * len(texts))
+            )
+            result = response.choices[0].message.content.strip()
+            logger.debug("Raw batch response content: %s", result)
+            
+            batch = _FALLACIES_BATCH_DECODER.decode(result)
+            if len(batch) != len(texts):
+                logger.error("Error: Batch response does not match the %d texts sent", len(texts))
+                return None
+            return batch
+            
+        except Exception as e:
+            logger.error("Error in batch OpenAI request: %s", e)
+            return None
+    
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def generate_response(self, fallacies: List[Dict[str, Any]], original_text: str) -> Optional[str]:
         """Generate a response explaining the fallacies found."""
@@ -1,8 +1,10 @@
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
+import asyncio
 import hmac
-import hashlib
-import json
+import orjson
+from collections import OrderedDict
+from functools import lru_cache
 from config import WEBHOOK_SECRET
 from .twitter_client import TwitterClient
 from .fallacy_detector import FallacyDetector
@@ -11,14 +13,46 @@ app = FastAPI()
 twitter_client = TwitterClient()
 fallacy_detector = FallacyDetector()
 
+# Most recently handled tweet IDs, so redelivered events aren't analyzed and replied to twice
+SEEN_TWEETS_SIZE = 10000
+_seen_tweet_ids = OrderedDict()
+
+# Keyed once at import; verify_signature copies it instead of re-deriving the key pads
+_HMAC_PROTOTYPE = hmac.new(WEBHOOK_SECRET.encode('utf-8'), digestmod='sha256')
+
+@lru_cache(maxsize=1)
+def get_bot_user_id() -> str:
+    """Get the bot account's user ID, fetched from Twitter once per process"""
+    return twitter_client.api.verify_credentials().id_str
+
+def mark_tweet_seen(tweet_id: str) -> bool:
+    """Record a tweet ID as handled. Returns False if it was already seen"""
+    if tweet_id in _seen_tweet_ids:
+        _seen_tweet_ids.move_to_end(tweet_id)
+        return False
+    _seen_tweet_ids[tweet_id] = None
+    if len(_seen_tweet_ids) > SEEN_TWEETS_SIZE:
+        _seen_tweet_ids.popitem(last=False)
+    return True
+
+def respond_to_tweet(tweet: dict, fallacies: list) -> None:
+    """Generate a response explaining the fallacies and post it as a reply"""
+    response = fallacy_detector.generate_response(fallacies, tweet["text"])
+    if response:
+        twitter_client.reply_to_tweet(tweet["id"], response)
+
 def verify_signature(request_body: bytes, signature: str) -> bool:
     """Verify the webhook signature from Twitter"""
-    expected_signature = hmac.new(
-        WEBHOOK_SECRET.encode('utf-8'),
-        msg=request_body,
-        digestmod=hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(signature, expected_signature)
+    # A hex SHA-256 digest is always 64 characters; reject anything else before hashing
+    if not signature or len(signature) != 64:
+        return False
+    try:
+        signature_bytes = bytes.fromhex(signature)
+    except ValueError:
+        return False
+    h = _HMAC_PROTOTYPE.copy()
+    h.update(request_body)
+    return hmac.compare_digest(signature_bytes, h.digest())
 
 @app.post("/webhook")
 async def twitter_webhook(request: Request):
@@ -26,24 +60,38 @@ async def twitter_webhook(request: Request):
     body = await request.body()
     signature = request.headers.get("x-twitter-webhooks-signature")
     
+    if not signature:
+        return JSONResponse(status_code=403, content={"error": "Missing signature"})
+    
     if not verify_signature(body, signature):
         return JSONResponse(status_code=403, content={"error": "Invalid signature"})
     
-    data = json.loads(body)
+    data = orjson.loads(body)
     
     # Handle tweet_create_events
     if "tweet_create_events" in data:
-        for tweet in data["tweet_create_events"]:
-            # Don't respond to our own tweets
-            if tweet["user"]["id_str"] == twitter_client.api.verify_credentials().id_str:
-                continue
+        # Don't respond to our own tweets, and only send likely candidates to OpenAI
+        bot_user_id = get_bot_user_id()
+        tweets = [
+            tweet for tweet in data["tweet_create_events"]
+            if mark_tweet_seen(tweet["id_str"])
+            and tweet["user"]["id_str"] != bot_user_id
+            and fallacy_detector.has_fallacy_indicators(tweet["text"])
+        ]
+        
+        if tweets:
+            # Analyze the whole batch in a worker thread so the blocking OpenAI calls
+            # don't stall the event loop
+            results = await asyncio.to_thread(
+                fallacy_detector.detect_fallacies_batch, [tweet["text"] for tweet in tweets]
+            )
             
-            # Analyze tweet for fallacies
-            fallacies = fallacy_detector.detect_fallacies(tweet["text"])
-            if fallacies:
-                response = fallacy_detector.generate_response(fallacies, tweet["text"])
-                if response:
-                    twitter_client.reply_to_tweet(tweet["id"], response)
+            # Generate and post replies concurrently; each is an independent OpenAI + Twitter round-trip
+            await asyncio.gather(*(
+                asyncio.to_thread(respond_to_tweet, tweet, fallacies)
+                for tweet, fallacies in zip(tweets, results)
+                if fallacies
+            ))
     
     return Response(status_code=200)
 
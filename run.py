@@ -1,7 +1,9 @@
+import json
 import subprocess
 import sys
 import time
 import os
+import urllib.request
 from pathlib import Path
 from dotenv import load_dotenv
 from bot.database.models import init_db
@@ -21,6 +23,22 @@ if sys.platform == 'win32':
 else:
     python_path = venv_path / 'bin' / 'python'
 
+def get_ngrok_url(ngrok_process, max_attempts=8):
+    """Poll ngrok's local API for the public URL, backing off only while it isn't up yet"""
+    for attempt in range(max_attempts):
+        if ngrok_process.poll() is not None:
+            raise RuntimeError(f"ngrok exited with code {ngrok_process.returncode}")
+        try:
+            with urllib.request.urlopen('http://localhost:4040/api/tunnels', timeout=5) as response:
+                tunnels = json.load(response)['tunnels']
+            if tunnels:
+                return tunnels[0]['public_url']
+        except OSError:
+            pass  # API not listening yet
+        if attempt < max_attempts - 1:
+            time.sleep(min(0.25 * 2 ** attempt, 4))
+    raise RuntimeError("ngrok tunnel did not come up")
+
 def run_ngrok():
     try:
         # Start ngrok
@@ -30,13 +48,10 @@ def run_ngrok():
             stderr=subprocess.PIPE,
             env=env
         )
-        time.sleep(3)  # Wait for ngrok to start
         
-        # Get the public URL
-        ngrok_url = subprocess.check_output(
-            ['curl', 'http://localhost:4040/api/tunnels'],
-            universal_newlines=True
-        )
+        # Get the public URL as soon as ngrok's local API reports the tunnel
+        ngrok_url = get_ngrok_url(ngrok_process)
+        print(f"ngrok tunnel: {ngrok_url}")
         return ngrok_process
     except Exception as e:
         print(f"Error starting ngrok: {e}")
@@ -44,9 +59,18 @@ def run_ngrok():
 
 def run_webhook_server():
     try:
-        # Start the FastAPI webhook server
+        # Start the FastAPI webhook server on uvloop + httptools. Keep a single worker:
+        # the seen-tweet set and detector caches live in process memory
+        event_loop = 'asyncio' if sys.platform == 'win32' else 'uvloop'
         webhook_process = subprocess.Popen(
-            [str(python_path), '-m', 'uvicorn', 'bot.webhook_handler:app', '--reload'],
+            [
+                str(python_path), '-m', 'uvicorn', 'bot.webhook_handler:app',
+                '--loop', event_loop,
+                '--http', 'httptools',
+                '--no-access-log',
+                '--host', '127.0.0.1',
+                '--port', '8000',
+            ],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             env=env
@@ -92,12 +116,16 @@ if __name__ == "__main__":
     dashboard_process = run_dashboard()
     
     try:
-        # Keep the script running
-        while True:
-            time.sleep(1)
+        # Block until ngrok exits (the webhook is unreachable without it) or Ctrl+C
+        ngrok_process.wait()
+        print(f"\nngrok exited with code {ngrok_process.returncode}, shutting down services...")
+        # ngrok dying on its own is a failure even if it exited cleanly
+        exit_code = ngrok_process.returncode or 1
     except KeyboardInterrupt:
         print("\nShutting down services...")
-        ngrok_process.terminate()
-        webhook_process.terminate()
-        dashboard_process.terminate()
-        sys.exit(0)
+        exit_code = 0
+    
+    ngrok_process.terminate()
+    webhook_process.terminate()
+    dashboard_process.terminate()
+    sys.exit(exit_code)